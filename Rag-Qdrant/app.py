@@ -8,12 +8,12 @@ API_URL = "http://127.0.0.1:8000"
 
 st.set_page_config(page_title="RAG-Qdrant Chatbot", layout="wide")
 st.title("🤖 RAG-Qdrant Chatbot")
-st.markdown("Upload PDFs or DOCX, ingest them, and query your documents!")
+st.markdown("Upload PDFs, DOCX or CSV, ingest them, and query your documents!")
 
 # ----------------- Sidebar: File Upload -----------------
 st.sidebar.header("📂 Upload Documents")
 uploaded_files = st.sidebar.file_uploader(
-    "Select your PDF or DOCX files", type=["pdf", "docx"], accept_multiple_files=True
+    "Select your PDF, DOCX or CSV files", type=["pdf", "docx", "csv"], accept_multiple_files=True
 )
 process_btn = st.sidebar.button("🚀 Process Files")
 
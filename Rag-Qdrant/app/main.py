@@ -1,15 +1,17 @@
 import os
 import json
+import uuid
 import traceback
 from concurrent.futures import ThreadPoolExecutor
-from fastapi import FastAPI, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, HTTPException, BackgroundTasks, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 import time
 
-from app.rag_pipeline import RAGPipeline
-from app.utils.file_loader import load_file_content
-from qdrant_client.http import models  # ✅ Added for Qdrant checks
+from app.rag_pipeline import (
+    RAGPipeline, MAX_BATCH_QUERIES, MAX_BATCH_CONCURRENCY, check_column_names
+)
+from app.utils.file_loader import load_file_content, is_tabular
 
 # ------------------ FastAPI Setup ------------------
 app = FastAPI(
@@ -51,14 +53,7 @@ def check_qdrant_file_exists(file_id: str):
     try:
         result = rag.qdrant_client.scroll(
             collection_name=rag.collection_name,
-            scroll_filter=models.Filter(
-                must=[
-                    models.FieldCondition(
-                        key="file_id",
-                        match=models.MatchValue(value=file_id)
-                    )
-                ]
-            ),
+            scroll_filter=rag.file_filter(file_id),
             limit=1
         )
         return len(result[0]) > 0
@@ -67,6 +62,39 @@ def check_qdrant_file_exists(file_id: str):
         return False
 
 # ------------------ Background ingestion ------------------
+def ingest_table_thread(file_path, filename, index_columns=None):
+    # Chosen up front so a failed run can still be traced to its points
+    file_id = str(uuid.uuid4())
+    try:
+        print(f"🟢 Starting tabular ingestion for: {filename}")
+        inserted_count, file_id, table_stats = rag.ingest_table(
+            file_path, file_id=file_id, index_columns=index_columns
+        )
+        if not inserted_count:
+            raise ValueError("File is empty or unreadable")
+
+        status_data[filename] = {
+            "status": "completed",
+            "progress": 100,
+            "file_id": file_id,
+            "chunks": inserted_count,
+            "rows": table_stats["rows"]
+        }
+        save_status()
+        print(f"✅ {filename} processed → {table_stats['rows']} rows in {inserted_count} chunks (file_id={file_id})")
+
+    except Exception as e:
+        print(f"❌ Error ingesting {filename}: {e}")
+        print(traceback.format_exc())
+        status_data[filename] = {
+            "status": "failed",
+            "progress": 0,
+            "error": str(e),
+            "file_id": None,
+            "partial_file_id": file_id
+        }
+        save_status()
+
 def ingest_text_thread(file_path, filename):
     try:
         print(f"🟢 Starting ingestion for: {filename}")
@@ -75,15 +103,18 @@ def ingest_text_thread(file_path, filename):
         if not text.strip():
             raise ValueError("File is empty or unreadable")
 
-        inserted_count, file_id = rag.ingest_text(text)
+        inserted_count, file_id, dedup_stats = rag.ingest_text(text)
         status_data[filename] = {
             "status": "completed",
             "progress": 100,
             "file_id": file_id,
-            "chunks": inserted_count
+            "chunks": inserted_count,
+            "dedup": dedup_stats
         }
         save_status()
         print(f"✅ {filename} processed → {inserted_count} chunks stored (file_id={file_id})")
+        if dedup_stats.get("embeddings_saved"):
+            print(f"♻️ {filename}: skipped {dedup_stats['embeddings_saved']} near-duplicate chunks")
 
     except Exception as e:
         print(f"❌ Error ingesting {filename}: {e}")
@@ -98,17 +129,32 @@ def ingest_text_thread(file_path, filename):
 
 # ------------------ Upload Endpoint ------------------
 @app.post("/ingest")
-async def ingest_file(file: UploadFile, background_tasks: BackgroundTasks):
+async def ingest_file(
+    file: UploadFile,
+    background_tasks: BackgroundTasks,
+    index_columns: str = Form(None)
+):
+    columns = [c.strip() for c in (index_columns or "").split(",") if c.strip()]
+    try:
+        check_column_names(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         file_location = os.path.join(UPLOAD_FOLDER, file.filename)
 
+        # Copy in 1 MB pieces so large exports never sit fully in memory
         with open(file_location, "wb") as f:
-            f.write(await file.read())
+            while chunk := await file.read(1024 * 1024):
+                f.write(chunk)
 
         status_data[file.filename] = {"status": "processing", "progress": 0, "file_id": None}
         save_status()
 
-        background_tasks.add_task(ingest_text_thread, file_location, file.filename)
+        if is_tabular(file.filename):
+            background_tasks.add_task(ingest_table_thread, file_location, file.filename, columns)
+        else:
+            background_tasks.add_task(ingest_text_thread, file_location, file.filename)
 
         return {
             "message": f"{file.filename} uploaded successfully. Processing started.",
@@ -178,6 +224,97 @@ async def ask_question(data: dict):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {e}")
 
+# ------------------ Table filter parsing ------------------
+def parse_table_filter(source, default=None):
+    """Read optional row_range / column_values from a request item, with batch defaults."""
+    default = default or {}
+    row_range = source.get("row_range", default.get("row_range"))
+    column_values = source.get("column_values", default.get("column_values"))
+
+    if row_range is not None:
+        if (
+            not isinstance(row_range, list)
+            or len(row_range) != 2
+            or not all(isinstance(r, int) and not isinstance(r, bool) for r in row_range)
+            or row_range[0] > row_range[1]
+        ):
+            raise HTTPException(status_code=400, detail="row_range must be [start, end] integers")
+
+    if column_values is not None:
+        if not isinstance(column_values, dict):
+            raise HTTPException(status_code=400, detail="column_values must be an object")
+        try:
+            check_column_names(list(column_values))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for values in column_values.values():
+            if isinstance(values, str):
+                continue
+            if not isinstance(values, list) or not values or not all(isinstance(v, str) for v in values):
+                raise HTTPException(
+                    status_code=400,
+                    detail="column_values entries must be a string or a list of strings"
+                )
+
+    if row_range is None and column_values is None:
+        return None
+    return {"row_range": row_range, "column_values": column_values}
+
+# ------------------ Ask Batch Endpoint ------------------
+@app.post("/ask_batch")
+def ask_question_batch(data: dict):
+    items = data.get("queries")
+    if not items or not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Queries are missing")
+    if len(items) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+
+    default_filename = data.get("filename")
+    default_filter = parse_table_filter(data)
+    queries, file_ids, table_filters = [], [], []
+    for item in items:
+        if isinstance(item, dict):
+            query = item.get("query") or ""
+            filename = item.get("filename", default_filename)
+            table_filter = parse_table_filter(item, default_filter)
+        else:
+            query = item or ""
+            filename = default_filename
+            table_filter = default_filter
+        if not isinstance(query, str):
+            raise HTTPException(status_code=400, detail="Each query must be a string")
+        if filename is not None and not isinstance(filename, str):
+            raise HTTPException(status_code=400, detail="filename must be a string")
+
+        file_id = None
+        if filename:
+            status = status_data.get(filename)
+            if not status:
+                raise HTTPException(status_code=404, detail=f"File {filename} not found")
+            file_id = status.get("file_id")
+        queries.append(query)
+        file_ids.append(file_id)
+        table_filters.append(table_filter)
+
+    max_concurrency = data.get("max_concurrency", 4)
+    if (
+        not isinstance(max_concurrency, int)
+        or isinstance(max_concurrency, bool)
+        or max_concurrency < 1
+    ):
+        raise HTTPException(status_code=400, detail="max_concurrency must be a positive integer")
+    max_concurrency = min(max_concurrency, MAX_BATCH_CONCURRENCY)
+
+    try:
+        return rag.ask_batch(
+            queries,
+            file_ids=file_ids,
+            max_concurrency=max_concurrency,
+            table_filters=table_filters
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch query failed: {e}")
+
 # ------------------ Ask Stream Endpoint ------------------
 @app.post("/ask_stream")
 async def ask_question_stream(data: dict):
@@ -211,6 +348,7 @@ def root():
             "/status/{filename}",
             "/process/{filename}",
             "/ask",
+            "/ask_batch",
             "/ask_stream"
         ]
     }
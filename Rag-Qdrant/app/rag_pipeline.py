@@ -1,8 +1,11 @@
 import os
+import re
 import time
 import uuid
 import hashlib
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 from langchain_community.document_loaders import PyPDFLoader, TextLoader, Docx2txtLoader, CSVLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -15,6 +18,24 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 from app.config import settings
 from app.utils.embeddings import get_embeddings_model
+from app.utils.file_loader import iter_table_chunks
+from app.utils.dedup import dedupe_chunks, hamming_distance, DEFAULT_MAX_DISTANCE
+
+# Server-side ceilings for /ask_batch, whatever the client asks for
+MAX_BATCH_QUERIES = 200
+MAX_BATCH_CONCURRENCY = 8
+
+# Column names become payload key paths (column_values.<name>)
+_COLUMN_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def check_column_names(columns):
+    """Raise ValueError for column names that are not valid payload keys."""
+    invalid = [c for c in columns if not isinstance(c, str) or not _COLUMN_NAME.match(c)]
+    if invalid:
+        raise ValueError(
+            f"Invalid column names (use letters, digits, '_' or '-'): {invalid}"
+        )
 
 
 class RAGPipeline:
@@ -27,6 +48,8 @@ class RAGPipeline:
             timeout=180
         )
         self.gemini_api_key = settings.GEMINI_API_KEY
+        # Serializes the read-modify-write of duplicate_file_ids within this process
+        self._dedup_lock = threading.Lock()
 
         # Determine vector size
         try:
@@ -51,16 +74,38 @@ class RAGPipeline:
         else:
             print(f"✅ Collection '{self.collection_name}' exists")
 
-        # ✅ Ensure payload index for file_id (Fix for Bad Request error)
+        # ✅ Ensure payload indexes (Fix for Bad Request error on filtered queries)
+        for field_name in ("file_id", "duplicate_file_ids", "simhash_bands"):
+            self._ensure_payload_index(field_name, models.PayloadSchemaType.KEYWORD)
+        for field_name in ("row_start", "row_end"):
+            self._ensure_payload_index(field_name, models.PayloadSchemaType.INTEGER)
+
+    def _ensure_payload_index(self, field_name, field_schema):
         try:
             self.qdrant_client.create_payload_index(
                 collection_name=self.collection_name,
-                field_name="file_id",
-                field_schema=models.PayloadSchemaType.KEYWORD
+                field_name=field_name,
+                field_schema=field_schema
             )
-            print("✅ Qdrant index ensured for 'file_id'")
+            print(f"✅ Qdrant index ensured for '{field_name}'")
         except Exception as e:
-            print(f"⚠️ Skipped creating 'file_id' index (might already exist): {e}")
+            print(f"⚠️ Skipped creating '{field_name}' index (might already exist): {e}")
+
+    # ---------------- file_id filter ----------------
+    def file_filter(self, file_id):
+        """Match points owned by file_id or merged into it as a near-duplicate."""
+        return models.Filter(
+            should=[
+                models.FieldCondition(
+                    key="file_id",
+                    match=models.MatchValue(value=file_id)
+                ),
+                models.FieldCondition(
+                    key="duplicate_file_ids",
+                    match=models.MatchValue(value=file_id)
+                ),
+            ]
+        )
 
     # ---------------- File loader ----------------
     def load_file(self, path):
@@ -88,12 +133,131 @@ class RAGPipeline:
     def _doc_hash(self, doc: Document):
         return hashlib.sha256((doc.page_content or "").encode()).hexdigest()
 
+    # ---------------- Near-duplicate suppression ----------------
+    def dedupe(self, chunks, file_id, cross_collection=True, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Drop chunks that are near-duplicates of another chunk in the same file
+        or (optionally) of a point already stored in the collection.
+        Collection duplicates are merged by adding file_id to the canonical
+        point's `duplicate_file_ids`, so file-scoped queries still find them.
+
+        The canonical point stays owned by the file that stored it first:
+        deleting points by that file's `file_id` also removes content the
+        files listed in `duplicate_file_ids` rely on, so those files must be
+        re-ingested afterwards.
+
+        Only the collection lookup and the merges run under `_dedup_lock`;
+        embedding and upserting happen outside it. Two files ingested at the
+        same time can therefore both store a chunk they share. The lock is
+        per process, so with several uvicorn workers concurrent merges into
+        the same point can still lose a file_id: run ingestion on one worker.
+        """
+        total = len(chunks)
+        chunks, in_file = dedupe_chunks(chunks, max_distance=max_distance)
+
+        in_collection = 0
+        if cross_collection and chunks:
+            with self._dedup_lock:
+                canonical = self._find_collection_duplicates(chunks, max_distance)
+                kept = []
+                for chunk in chunks:
+                    match = canonical.get(chunk.metadata["simhash"])
+                    if match is None:
+                        kept.append(chunk)
+                        continue
+                    in_collection += 1
+                    if file_id != match.payload.get("file_id"):
+                        self._merge_duplicate(match.id, file_id)
+            chunks = kept
+
+        saved = in_file + in_collection
+        stats = {
+            "chunks_total": total,
+            "duplicates_in_file": in_file,
+            "duplicates_in_collection": in_collection,
+            "embeddings_saved": saved,
+            "points_saved": saved,
+        }
+        return chunks, stats
+
+    def _merge_duplicate(self, point_id, file_id):
+        """Add file_id to a canonical point's duplicate_file_ids (fresh read, then write)."""
+        try:
+            points = self.qdrant_client.retrieve(
+                collection_name=self.collection_name,
+                ids=[point_id],
+                with_payload=["duplicate_file_ids"],
+            )
+            if not points:
+                return
+            dup_ids = (points[0].payload or {}).get("duplicate_file_ids", [])
+            if file_id in dup_ids:
+                return
+            self.qdrant_client.set_payload(
+                collection_name=self.collection_name,
+                payload={"duplicate_file_ids": dup_ids + [file_id]},
+                points=[point_id],
+            )
+        except Exception as e:
+            print(f"⚠️ Failed to merge duplicate into {point_id}: {e}")
+
+    def _find_collection_duplicates(self, chunks, max_distance):
+        """Map chunk simhash -> existing near-duplicate point, via LSH band lookup."""
+        by_band = {}
+        for chunk in chunks:
+            for band in chunk.metadata["simhash_bands"]:
+                by_band.setdefault(band, []).append(chunk)
+
+        matches = {}
+        bands = list(by_band)
+        batch_size = 256
+        for i in range(0, len(bands), batch_size):
+            band_filter = models.Filter(
+                must=[
+                    models.FieldCondition(
+                        key="simhash_bands",
+                        match=models.MatchAny(any=bands[i:i + batch_size])
+                    )
+                ]
+            )
+            offset = None
+            while True:
+                try:
+                    points, offset = self.qdrant_client.scroll(
+                        collection_name=self.collection_name,
+                        scroll_filter=band_filter,
+                        limit=256,
+                        offset=offset,
+                        with_payload=["simhash", "simhash_bands", "file_id", "duplicate_file_ids"],
+                        with_vectors=False,
+                    )
+                except Exception as e:
+                    print(f"⚠️ Collection duplicate lookup failed: {e}")
+                    return matches
+
+                for point in points:
+                    payload = point.payload or {}
+                    if not payload.get("simhash"):
+                        continue
+                    sig = int(payload["simhash"], 16)
+                    for band in payload.get("simhash_bands", []):
+                        for chunk in by_band.get(band, []):
+                            key = chunk.metadata["simhash"]
+                            if key in matches:
+                                continue
+                            if hamming_distance(int(key, 16), sig) <= max_distance:
+                                matches[key] = point
+                if offset is None:
+                    break
+        return matches
+
     # ---------------- Store in Qdrant ----------------
-    def store_in_qdrant(self, docs, file_id=None):
+    def store_in_qdrant(self, docs, file_id=None, ensure_collection=True):
         if not docs:
             return 0, file_id
 
-        self._ensure_collection()
+        if ensure_collection:
+            self._ensure_collection()
         batch_size = 20
         if not file_id:
             file_id = str(uuid.uuid4())
@@ -102,11 +266,20 @@ class RAGPipeline:
         for i in range(0, len(docs), batch_size):
             batch = docs[i:i + batch_size]
             points = []
-            for doc in batch:
+            try:
+                # One forward pass per batch; fall back to per-chunk on failure
+                vectors = self.embedding_model.embed_documents(
+                    [doc.page_content for doc in batch]
+                )
+            except Exception as e:
+                print(f"⚠️ Batch embedding failed, retrying per chunk: {e}")
+                vectors = [None] * len(batch)
+            for doc, vec in zip(batch, vectors):
                 try:
-                    vec = self.embedding_model.embed_documents(
-                        [doc.page_content]
-                    )[0]
+                    if vec is None:
+                        vec = self.embedding_model.embed_documents(
+                            [doc.page_content]
+                        )[0]
                     points.append({
                         "id": str(uuid.uuid4()),
                         "vector": vec,
@@ -132,12 +305,91 @@ class RAGPipeline:
         return inserted_count, file_id
 
     # ---------------- Ingest plain text ----------------
-    def ingest_text(self, text, file_id=None):
+    def ingest_text(self, text, file_id=None, dedup=True, cross_collection=True):
         if not text.strip():
             raise ValueError("Text empty")
+        if not file_id:
+            file_id = str(uuid.uuid4())
         docs = [Document(page_content=text)]
         chunks = self.split_text(docs)
-        return self.store_in_qdrant(chunks, file_id=file_id)
+        stats = {}
+        if dedup:
+            chunks, stats = self.dedupe(chunks, file_id, cross_collection=cross_collection)
+        inserted_count, file_id = self.store_in_qdrant(chunks, file_id=file_id)
+        return inserted_count, file_id, stats
+
+    # ---------------- Ingest tabular file (streaming) ----------------
+    def ingest_table(self, path, file_id=None, index_columns=None,
+                     rows_per_chunk=50, chunks_per_batch=20):
+        """
+        Stream a CSV/TSV file into Qdrant without loading it into memory.
+        Rows are grouped into header-prefixed chunks; every `chunks_per_batch`
+        chunks are embedded and upserted before more rows are read.
+        `index_columns` values are stored under `column_values.<name>` and indexed.
+        If ingestion fails partway, points already stored for file_id are deleted.
+        """
+        check_column_names(index_columns or [])
+        if not file_id:
+            file_id = str(uuid.uuid4())
+        self._ensure_collection()
+        for column in index_columns or []:
+            self._ensure_payload_index(
+                f"column_values.{column}", models.PayloadSchemaType.KEYWORD
+            )
+
+        inserted_count = 0
+        rows = 0
+        batch = []
+
+        def store(batch):
+            # store_in_qdrant only logs failed chunks/upserts; a short count
+            # means rows went missing, so fail the whole file instead
+            count, _ = self.store_in_qdrant(batch, file_id=file_id, ensure_collection=False)
+            if count != len(batch):
+                raise RuntimeError(
+                    f"Stored {count} of {len(batch)} chunks "
+                    f"(rows {batch[0].metadata['row_start']}-{batch[-1].metadata['row_end']})"
+                )
+            return count
+
+        try:
+            for text, metadata in iter_table_chunks(
+                path, rows_per_chunk=rows_per_chunk, index_columns=index_columns
+            ):
+                batch.append(Document(page_content=text, metadata=metadata))
+                rows = metadata["row_end"]
+                if len(batch) >= chunks_per_batch:
+                    inserted_count += store(batch)
+                    batch = []
+            if batch:
+                inserted_count += store(batch)
+        except Exception:
+            # A short batch may have stored some points before failing
+            self.delete_file_points(file_id)
+            raise
+
+        return inserted_count, file_id, {"rows": rows}
+
+    # ---------------- Delete file points ----------------
+    def delete_file_points(self, file_id):
+        """Delete every point owned by file_id (used to roll back partial ingests)."""
+        try:
+            self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(
+                    filter=models.Filter(
+                        must=[
+                            models.FieldCondition(
+                                key="file_id",
+                                match=models.MatchValue(value=file_id)
+                            )
+                        ]
+                    )
+                ),
+            )
+            print(f"🧹 Removed partially ingested points for file_id={file_id}")
+        except Exception as e:
+            print(f"❌ Failed to remove partial points for file_id={file_id}: {e}")
 
     # ---------------- Memory ----------------
     def get_memory(self, file_id):
@@ -167,6 +419,10 @@ class RAGPipeline:
             return {"answer": "No relevant context found"}
 
         context = "\n".join([d.page_content for d in related_docs])
+        return self._generate_answer(query, context, memory)
+
+    # ---------------- Generate answer ----------------
+    def _generate_answer(self, query, context, memory):
         chat_history = memory.load_memory_variables({}).get(memory.memory_key, "")
 
         prompt = (
@@ -190,6 +446,131 @@ class RAGPipeline:
         except Exception as e:
             return {"error": f"Gemini API failed: {e}"}
 
+    # ---------------- Ask Batch ----------------
+    # ---------------- Table filter ----------------
+    def table_filter(self, row_range=None, column_values=None):
+        """
+        Conditions on tabular payload fields: `row_range` (start, end) keeps
+        chunks overlapping those rows, `column_values` maps a column to a
+        value or list of values. Returns a list of conditions (empty if none).
+        """
+        conditions = []
+        if row_range:
+            start, end = row_range
+            conditions.append(models.FieldCondition(key="row_end", range=models.Range(gte=start)))
+            conditions.append(models.FieldCondition(key="row_start", range=models.Range(lte=end)))
+        if column_values:
+            check_column_names(list(column_values))
+            for column, values in column_values.items():
+                if isinstance(values, str):
+                    values = [values]
+                conditions.append(models.FieldCondition(
+                    key=f"column_values.{column}",
+                    match=models.MatchAny(any=list(values))
+                ))
+        return conditions
+
+    def ask_batch(self, queries, file_ids=None, k=4, max_concurrency=4, table_filters=None):
+        """
+        Answer many queries at once: one batched embedding call, one Qdrant
+        batch search (each query with its own optional file_id filter and
+        `table_filters` entry, a dict of table_filter() arguments) and
+        concurrent generation with at most `max_concurrency` LLM calls in flight
+        (capped at MAX_BATCH_CONCURRENCY).
+        Results are returned in the same order as `queries`.
+        """
+        if not queries:
+            return {"results": [], "timings": {}}
+        if len(queries) > MAX_BATCH_QUERIES:
+            raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+        if file_ids is None:
+            file_ids = [None] * len(queries)
+        if len(file_ids) != len(queries):
+            raise ValueError("file_ids must match the number of queries")
+        if table_filters is None:
+            table_filters = [None] * len(queries)
+        if len(table_filters) != len(queries):
+            raise ValueError("table_filters must match the number of queries")
+
+        results = [None] * len(queries)
+        pending = []
+        for idx, query in enumerate(queries):
+            if not query or not query.strip():
+                results[idx] = {"query": query, "error": "Query missing"}
+            else:
+                pending.append(idx)
+
+        batch_start = time.perf_counter()
+        embed_ms = search_ms = 0.0
+        if pending:
+            # One forward pass for every query
+            t0 = time.perf_counter()
+            vectors = self.embedding_model.embed_documents([queries[i] for i in pending])
+            embed_ms = (time.perf_counter() - t0) * 1000
+
+            # One round-trip for every search
+            requests = []
+            for i, vec in zip(pending, vectors):
+                conditions = self.table_filter(**(table_filters[i] or {}))
+                if file_ids[i]:
+                    conditions.append(self.file_filter(file_ids[i]))
+                query_filter = models.Filter(must=conditions) if conditions else None
+                requests.append(models.QueryRequest(
+                    query=vec,
+                    filter=query_filter,
+                    limit=k,
+                    with_payload=True,
+                ))
+            t0 = time.perf_counter()
+            responses = self.qdrant_client.query_batch_points(
+                collection_name=self.collection_name, requests=requests
+            )
+            search_ms = (time.perf_counter() - t0) * 1000
+
+            def generate(i, points):
+                t_start = time.perf_counter()
+                contents = [
+                    (p.payload or {}).get("page_content", "") for p in points
+                ]
+                contents = [c for c in contents if c]
+                if not contents:
+                    result = {"answer": "No relevant context found"}
+                else:
+                    memory = (
+                        self.get_memory(file_ids[i])
+                        if file_ids[i]
+                        else ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+                    )
+                    result = self._generate_answer(queries[i], "\n".join(contents), memory)
+                generation_ms = (time.perf_counter() - t_start) * 1000
+                return {
+                    "query": queries[i],
+                    **result,
+                    "sources": len(contents),
+                    "timings": {"generation_ms": round(generation_ms, 2)},
+                }
+
+            workers = max(1, min(max_concurrency, MAX_BATCH_CONCURRENCY, len(pending)))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(generate, i, resp.points)
+                    for i, resp in zip(pending, responses)
+                ]
+                for i, future in zip(pending, futures):
+                    try:
+                        results[i] = future.result()
+                    except Exception as e:
+                        results[i] = {"query": queries[i], "error": f"Generation failed: {e}"}
+
+        return {
+            "results": results,
+            "timings": {
+                "embedding_ms": round(embed_ms, 2),
+                "search_ms": round(search_ms, 2),
+                "total_ms": round((time.perf_counter() - batch_start) * 1000, 2),
+            },
+        }
+
     # ---------------- Ask Stream ----------------
     def ask_stream(self, query, file_id=None):
         if not query.strip():
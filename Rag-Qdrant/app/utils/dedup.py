@@ -0,0 +1,120 @@
+# utils/dedup.py
+"""
+Near-duplicate detection for chunks.
+
+Two chunks are near-duplicates when the SimHash signatures of their normalized
+text (see normalize_text) differ in at most DEFAULT_MAX_DISTANCE bits.
+Whitespace, case and page-number markers normalize away and always match;
+numbers in the body are kept, so chunks with different figures stay distinct.
+Small wording edits flip only a few bits and are usually, not always, caught.
+"""
+
+import re
+import hashlib
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+# With 4 bands of 16 bits, any two signatures within 3 bits share a band
+DEFAULT_MAX_DISTANCE = 3
+
+
+# "12", "page 12", "page 12 of 40", "12 of 40", "12 / 40"
+_PAGE_MARKER = r"(?:page\s+)?\d+(?:\s*(?:of|/)\s*\d+)?"
+_PAGE_LINE = re.compile(rf"^[ \t]*{_PAGE_MARKER}[ \t]*$", re.MULTILINE)
+# Loaders collapse newlines, so also strip "page N" / "N of M" at the chunk edges
+_EDGE_MARKER = r"(?:page\s+\d+(?:\s+of\s+\d+)?|\d+\s+of\s+\d+)"
+_LEADING_MARKER = re.compile(rf"^\s*{_EDGE_MARKER}\b")
+_TRAILING_MARKER = re.compile(rf"\b{_EDGE_MARKER}\s*$")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Lowercase, drop page-number markers and collapse whitespace, so layout
+    and page-number differences produce identical signatures.
+    """
+    text = _PAGE_LINE.sub("", (text or "").lower())
+    text = _LEADING_MARKER.sub("", text)
+    text = _TRAILING_MARKER.sub("", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _shingles(text: str, size: int = 3):
+    words = text.split(" ")
+    if len(words) <= size:
+        return [text] if text else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word 3-shingles of the normalized text."""
+    weights = [0] * SIMHASH_BITS
+    for shingle in _shingles(normalize_text(text)):
+        h = int.from_bytes(
+            hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big"
+        )
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            value |= 1 << bit
+    return value
+
+
+def simhash_bands(value: int):
+    """Split a signature into LSH band keys ("<band>:<hex>")."""
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [
+        f"{band}:{(value >> (band * width)) & mask:04x}"
+        for band in range(SIMHASH_BANDS)
+    ]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def dedupe_chunks(chunks, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    Drop near-duplicate chunks within one file.
+    Signatures are written into each kept chunk's metadata
+    ("simhash", "simhash_bands", "duplicate_count") so they land in the Qdrant payload.
+    Returns (kept_chunks, dropped_count).
+    """
+    kept = []
+    signatures = []
+    buckets = {}
+    dropped = 0
+
+    for chunk in chunks:
+        sig = simhash(chunk.page_content)
+        bands = simhash_bands(sig)
+
+        canonical = None
+        for band in bands:
+            for idx in buckets.get(band, []):
+                if hamming_distance(sig, signatures[idx]) <= max_distance:
+                    canonical = idx
+                    break
+            if canonical is not None:
+                break
+
+        if canonical is not None:
+            kept[canonical].metadata["duplicate_count"] += 1
+            dropped += 1
+            continue
+
+        chunk.metadata["simhash"] = to_hex(sig)
+        chunk.metadata["simhash_bands"] = bands
+        chunk.metadata["duplicate_count"] = 0
+        for band in bands:
+            buckets.setdefault(band, []).append(len(kept))
+        kept.append(chunk)
+        signatures.append(sig)
+
+    return kept, dropped
@@ -1,4 +1,6 @@
 import os
+import sys
+import csv
 from io import BytesIO
 from PyPDF2 import PdfReader
 import docx
@@ -19,9 +21,101 @@ def load_file_content(file_or_path, from_disk=False) -> str:
         return _load_docx(contents)
     elif ext == ".txt":
         return _load_txt(contents)
+    elif ext in TABULAR_EXTENSIONS:
+        raise ValueError(f"Tabular file {ext} must be ingested with iter_table_chunks")
     else:
         raise ValueError(f"Unsupported file format: {ext}")
 
+TABULAR_EXTENSIONS = {".csv": ",", ".tsv": "\t"}
+
+# Large exports can hold cells far above csv's 128 KB default field limit
+try:
+    csv.field_size_limit(sys.maxsize)
+except OverflowError:
+    csv.field_size_limit(2 ** 31 - 1)
+
+def is_tabular(path) -> bool:
+    return os.path.splitext(path)[-1].lower() in TABULAR_EXTENSIONS
+
+def iter_table_chunks(path, rows_per_chunk=50, max_chars=1200, index_columns=None):
+    """
+    Stream a CSV/TSV file row by row and yield (text, metadata) chunks.
+    Each chunk repeats the column headers and covers at most `rows_per_chunk`
+    rows / roughly `max_chars` characters, so memory stays bounded by one chunk.
+    A row too long for one chunk is split over several chunks (`row_part` 1..n),
+    each carrying that row's `index_columns` values.
+    Metadata holds the 1-based row range and the distinct values of `index_columns`.
+    """
+    delimiter = TABULAR_EXTENSIONS[os.path.splitext(path)[-1].lower()]
+    index_columns = index_columns or []
+
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        headers = [h.strip() for h in next(reader, [])]
+        if not headers:
+            return
+        missing = [c for c in index_columns if c not in headers]
+        if missing:
+            raise ValueError(f"Unknown index columns: {', '.join(missing)}")
+        positions = {c: headers.index(c) for c in index_columns}
+        header_line = "Columns: " + " | ".join(headers)
+        # Room left for row text once the header is repeated
+        budget = max(max_chars - len(header_line) - 1, 200)
+
+        def chunk(text_lines, row_start, row_end, values, row_part=None):
+            metadata = {
+                "source_type": "table",
+                "row_start": row_start,
+                "row_end": row_end,
+                "column_values": {c: sorted(v) for c, v in values.items()},
+            }
+            if row_part is not None:
+                metadata["row_part"] = row_part
+            return header_line + "\n" + "\n".join(text_lines), metadata
+
+        lines, values = [], {c: set() for c in index_columns}
+        size, row_start, row_end = 0, None, None
+
+        row_number = 0
+        for row in reader:
+            row_number += 1
+            if not any(cell.strip() for cell in row):
+                continue
+            line = " | ".join(re.sub(r"\s+", " ", cell).strip() for cell in row)
+            row_values = {
+                c: {row[pos].strip()} if pos < len(row) and row[pos].strip() else set()
+                for c, pos in positions.items()
+            }
+
+            if lines and (
+                len(lines) >= rows_per_chunk
+                or size + len(line) > budget
+                or len(line) > budget
+            ):
+                yield chunk(lines, row_start, row_end, values)
+                lines, values = [], {c: set() for c in index_columns}
+                size, row_start = 0, None
+
+            if len(line) > budget:
+                # Oversized row: split it rather than dropping the tail
+                for part, start in enumerate(range(0, len(line), budget), start=1):
+                    yield chunk(
+                        [line[start:start + budget]], row_number, row_number,
+                        row_values, row_part=part
+                    )
+                continue
+
+            if row_start is None:
+                row_start = row_number
+            lines.append(line)
+            row_end = row_number
+            size += len(line) + 1
+            for c, v in row_values.items():
+                values[c] |= v
+
+        if lines:
+            yield chunk(lines, row_start, row_end, values)
+
 def _load_pdf(file_bytes: bytes) -> str:
     text = ""
     pdf = PdfReader(BytesIO(file_bytes))
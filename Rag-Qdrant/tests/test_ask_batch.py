@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.rag_pipeline import RAGPipeline
+
+
+class StubEmbeddings:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+class StubQdrant:
+    def __init__(self):
+        self.requests = None
+
+    def query_batch_points(self, collection_name, requests):
+        self.requests = requests
+        return [
+            SimpleNamespace(points=[
+                SimpleNamespace(payload={"page_content": f"context for {r.query[0]:.0f}"})
+            ])
+            for r in requests
+        ]
+
+
+def make_pipeline():
+    # Skip __init__: it connects to Qdrant and loads the embedding model
+    rag = RAGPipeline.__new__(RAGPipeline)
+    rag.collection_name = "test"
+    rag.embedding_model = StubEmbeddings()
+    rag.qdrant_client = StubQdrant()
+    rag._generate_answer = lambda query, context, memory: {"answer": f"{query} <- {context}"}
+    return rag
+
+
+def test_ask_batch_keeps_order_and_batches_calls():
+    rag = make_pipeline()
+    queries = ["a", "bbb", "  ", "cc"]
+
+    out = rag.ask_batch(queries, max_concurrency=3)
+    results = out["results"]
+
+    assert [r["query"] for r in results] == queries
+    assert results[0]["answer"] == "a <- context for 1"
+    assert results[1]["answer"] == "bbb <- context for 3"
+    assert results[2] == {"query": "  ", "error": "Query missing"}
+    assert results[3]["answer"] == "cc <- context for 2"
+    assert "generation_ms" in results[0]["timings"]
+
+    # One embedding call and one batch search for the non-blank queries
+    assert rag.embedding_model.calls == [["a", "bbb", "cc"]]
+    assert len(rag.qdrant_client.requests) == 3
+    assert set(out["timings"]) == {"embedding_ms", "search_ms", "total_ms"}
+
+
+def test_ask_batch_applies_file_id_per_request():
+    rag = make_pipeline()
+
+    rag.ask_batch(["a", "b"], file_ids=["file-1", None])
+    first, second = rag.qdrant_client.requests
+
+    assert second.filter is None
+    (file_filter,) = first.filter.must
+    values = {c.key: c.match.value for c in file_filter.should}
+    assert values == {"file_id": "file-1", "duplicate_file_ids": "file-1"}
+
+
+def test_ask_batch_applies_table_filters():
+    rag = make_pipeline()
+
+    rag.ask_batch(
+        ["a", "b"],
+        table_filters=[
+            {"row_range": [10, 20], "column_values": {"region": "EU"}},
+            None,
+        ],
+    )
+    first, second = rag.qdrant_client.requests
+
+    assert second.filter is None
+    row_end, row_start, region = first.filter.must
+    assert (row_end.key, row_end.range.gte) == ("row_end", 10)
+    assert (row_start.key, row_start.range.lte) == ("row_start", 20)
+    assert (region.key, region.match.any) == ("column_values.region", ["EU"])
+
+
+def test_table_filter_rejects_unsafe_column_names():
+    rag = make_pipeline()
+    with pytest.raises(ValueError):
+        rag.table_filter(column_values={"first name": "x"})
+    with pytest.raises(ValueError):
+        rag.table_filter(column_values={"a.b": "x"})
@@ -0,0 +1,133 @@
+import random
+
+from app.utils.dedup import (
+    DEFAULT_MAX_DISTANCE,
+    SIMHASH_BANDS,
+    dedupe_chunks,
+    hamming_distance,
+    normalize_text,
+    simhash,
+    simhash_bands,
+)
+
+
+class Chunk:
+    """Minimal stand-in for a LangChain Document."""
+
+    def __init__(self, page_content):
+        self.page_content = page_content
+        self.metadata = {}
+
+
+def make_text(seed, words=200):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(500)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+BASE = make_text(1)
+
+
+# ---------------- simhash ----------------
+def test_simhash_is_deterministic_64_bit():
+    assert simhash(BASE) == simhash(BASE)
+    assert 0 <= simhash(BASE) < 2 ** 64
+
+
+def test_exact_copy_has_zero_distance():
+    assert hamming_distance(simhash(BASE), simhash(BASE)) == 0
+
+
+def test_whitespace_and_case_variants_match_exactly():
+    variant = "  " + BASE.upper().replace(" ", " \n\t ") + "\n"
+    assert normalize_text(variant) == normalize_text(BASE)
+    assert simhash(variant) == simhash(BASE)
+
+
+def test_page_number_variants_match_exactly():
+    assert simhash(f"Page 1\n{BASE}") == simhash(f"Page 217\n{BASE}")
+    assert simhash(f"{BASE}\n12\n") == simhash(f"{BASE}\n13\n")
+    assert simhash(f"{BASE} 3 of 40") == simhash(f"{BASE} 4 of 40")
+    assert simhash(f"page 5 of 9 {BASE}") == simhash(BASE)
+
+
+def test_numbers_in_body_are_kept():
+    assert normalize_text("x1 = 42") == "x1 = 42"
+
+    report = (
+        "In fiscal year {} the company reported revenue of {} million "
+        "across {} regions, with growth driven by new products and services."
+    )
+    config = "timeout = {}\nport = {}\nretries = 3\nhost = localhost\nlog_level = info"
+    chunks = [
+        Chunk(report.format(2021, 512, 12)),
+        Chunk(report.format(2023, 734, 18)),
+        Chunk(config.format(30, 8080)),
+        Chunk(config.format(600, 443)),
+    ]
+    kept, dropped = dedupe_chunks(chunks)
+    assert dropped == 0
+    assert kept == chunks
+
+
+def test_single_word_edit_stays_close():
+    words = BASE.split(" ")
+    words[100] = "changed"
+    edited = " ".join(words)
+    assert hamming_distance(simhash(BASE), simhash(edited)) < 16
+
+
+def test_unrelated_text_is_not_a_duplicate():
+    assert hamming_distance(simhash(BASE), simhash(make_text(2))) > DEFAULT_MAX_DISTANCE
+
+
+# ---------------- simhash_bands ----------------
+def test_bands_cover_the_whole_signature():
+    value = simhash(BASE)
+    bands = simhash_bands(value)
+    assert len(bands) == SIMHASH_BANDS
+    rebuilt = 0
+    for band in bands:
+        index, part = band.split(":")
+        rebuilt |= int(part, 16) << (int(index) * 16)
+    assert rebuilt == value
+
+
+def test_signatures_within_max_distance_share_a_band():
+    rng = random.Random(7)
+    value = simhash(BASE)
+    for _ in range(200):
+        flipped = value
+        for bit in rng.sample(range(64), DEFAULT_MAX_DISTANCE):
+            flipped ^= 1 << bit
+        assert set(simhash_bands(value)) & set(simhash_bands(flipped))
+
+
+# ---------------- dedupe_chunks ----------------
+def test_dedupe_drops_copies_and_keeps_first():
+    chunks = [
+        Chunk(f"Page 1 {BASE}"),
+        Chunk(make_text(2)),
+        Chunk(f"Page 2\n\n{BASE}"),
+        Chunk(f"page 3 {BASE}"),
+    ]
+    kept, dropped = dedupe_chunks(chunks)
+
+    assert dropped == 2
+    assert kept == [chunks[0], chunks[1]]
+    assert kept[0].metadata["duplicate_count"] == 2
+    assert kept[1].metadata["duplicate_count"] == 0
+
+
+def test_dedupe_records_signature_metadata():
+    kept, _ = dedupe_chunks([Chunk(BASE)])
+    metadata = kept[0].metadata
+    assert metadata["simhash"] == f"{simhash(BASE):016x}"
+    assert metadata["simhash_bands"] == simhash_bands(simhash(BASE))
+
+
+def test_dedupe_keeps_unrelated_chunks():
+    chunks = [Chunk(make_text(seed)) for seed in range(10, 20)]
+    kept, dropped = dedupe_chunks(chunks)
+    assert dropped == 0
+    assert kept == chunks
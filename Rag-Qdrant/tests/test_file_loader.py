@@ -0,0 +1,78 @@
+import pytest
+
+from app.utils.file_loader import iter_table_chunks
+
+
+def write_csv(tmp_path, text, name="table.csv"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_rows_grouped_with_header_and_row_ranges(tmp_path):
+    rows = "".join(f"{i},{'EU' if i % 2 else 'US'},note {i}\n" for i in range(1, 8))
+    path = write_csv(tmp_path, "id,region,note\n" + rows)
+
+    chunks = list(iter_table_chunks(path, rows_per_chunk=3, index_columns=["region"]))
+
+    assert [(m["row_start"], m["row_end"]) for _, m in chunks] == [(1, 3), (4, 6), (7, 7)]
+    for text, _ in chunks:
+        assert text.startswith("Columns: id | region | note\n")
+    assert chunks[0][0].endswith("3 | EU | note 3")
+    assert chunks[0][1]["column_values"] == {"region": ["EU", "US"]}
+    assert chunks[2][1]["column_values"] == {"region": ["EU"]}
+
+
+def test_blank_rows_are_skipped_but_keep_numbering(tmp_path):
+    path = write_csv(tmp_path, "id,region\n1,EU\n,\n3,US\n")
+
+    (text, metadata), = iter_table_chunks(path)
+
+    assert text == "Columns: id | region\n1 | EU\n3 | US"
+    assert (metadata["row_start"], metadata["row_end"]) == (1, 3)
+
+
+def test_tsv_uses_tab_delimiter(tmp_path):
+    path = write_csv(tmp_path, "id\tcity\n1\tOslo\n", name="table.tsv")
+
+    (text, _), = iter_table_chunks(path)
+
+    assert text == "Columns: id | city\n1 | Oslo"
+
+
+def test_oversized_row_is_split_not_truncated(tmp_path):
+    blob = "y" * 3000
+    path = write_csv(
+        tmp_path,
+        f"id,blob,city\n1,a,x\n2,{blob},tail_city\n3,b,z\n",
+    )
+
+    chunks = list(iter_table_chunks(path, max_chars=1200, index_columns=["city"]))
+    parts = [(t, m) for t, m in chunks if m["row_start"] == 2]
+
+    assert len(parts) > 1
+    assert [m["row_part"] for _, m in parts] == list(range(1, len(parts) + 1))
+    for text, metadata in parts:
+        assert text.startswith("Columns: id | blob | city\n")
+        assert len(text) <= 1200
+        assert metadata["column_values"] == {"city": ["tail_city"]}
+
+    # The whole row survives across the parts, including the trailing cell
+    body = "".join(t.split("\n", 1)[1] for t, _ in parts)
+    assert body == f"2 | {blob} | tail_city"
+    assert [m["row_start"] for _, m in chunks] == [1, 2, 2, 2, 3]
+
+
+def test_cells_above_default_csv_field_limit(tmp_path):
+    path = write_csv(tmp_path, "id,blob\n1," + "x" * 200_000 + "\n")
+
+    chunks = list(iter_table_chunks(path))
+
+    assert sum(len(t.split("\n", 1)[1]) for t, _ in chunks) == len("1 | ") + 200_000
+
+
+def test_unknown_index_column(tmp_path):
+    path = write_csv(tmp_path, "id,region\n1,EU\n")
+
+    with pytest.raises(ValueError, match="Unknown index columns"):
+        list(iter_table_chunks(path, index_columns=["country"]))
@@ -0,0 +1,53 @@
+import pytest
+
+from app.rag_pipeline import RAGPipeline
+
+
+def make_pipeline(stored_counts):
+    # Skip __init__: it connects to Qdrant and loads the embedding model
+    rag = RAGPipeline.__new__(RAGPipeline)
+    rag.deleted = []
+    rag._ensure_collection = lambda: None
+    rag._ensure_payload_index = lambda *args: None
+    rag.delete_file_points = rag.deleted.append
+    counts = iter(stored_counts)
+    rag.store_in_qdrant = lambda batch, file_id, ensure_collection: (
+        min(next(counts), len(batch)), file_id
+    )
+    return rag
+
+
+def write_rows(tmp_path, n):
+    path = tmp_path / "table.csv"
+    path.write_text("id\n" + "".join(f"{i}\n" for i in range(1, n + 1)))
+    return str(path)
+
+
+def test_ingest_table_streams_in_batches(tmp_path):
+    rag = make_pipeline([99, 99, 99])
+
+    count, file_id, stats = rag.ingest_table(
+        write_rows(tmp_path, 10), file_id="f1", rows_per_chunk=2, chunks_per_batch=2
+    )
+
+    assert (count, file_id, stats) == (5, "f1", {"rows": 10})
+    assert rag.deleted == []
+
+
+def test_ingest_table_rolls_back_when_a_batch_is_short(tmp_path):
+    # Second batch loses a chunk inside store_in_qdrant (logged, not raised)
+    rag = make_pipeline([2, 1, 2])
+
+    with pytest.raises(RuntimeError, match="Stored 1 of 2 chunks"):
+        rag.ingest_table(
+            write_rows(tmp_path, 10), file_id="f1", rows_per_chunk=2, chunks_per_batch=2
+        )
+
+    assert rag.deleted == ["f1"]
+
+
+def test_ingest_table_rejects_unsafe_index_columns(tmp_path):
+    rag = make_pipeline([])
+
+    with pytest.raises(ValueError, match="Invalid column names"):
+        rag.ingest_table(write_rows(tmp_path, 1), index_columns=["order id"])